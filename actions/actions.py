@@ -5,6 +5,8 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 
+from .profiling import profile_action, stage
+
 
 def load_certificate_data():
     try:
@@ -23,10 +25,23 @@ def load_certificate_data():
         print(f"Error loading certificate data: {str(e)}")
         return {}
 CERT_DATA = load_certificate_data()
+
+
+def get_certificate_info(*cert_types: Text) -> Dict[Text, Any]:
+    # Keys exist in both space and underscore form, see load_certificate_data
+    with stage("lookup"):
+        for cert_type in cert_types:
+            cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+            if cert_info:
+                return cert_info
+        return {}
+
+
 class ActionResetCertificateType(Action):
     def name(self) -> Text:
         return "action_reset_certificate_type"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -35,6 +50,7 @@ class ActionProvideCertificateInfo(Action):
     def name(self) -> Text:
         return "action_provide_certificate_info"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -44,7 +60,7 @@ class ActionProvideCertificateInfo(Action):
             dispatcher.utter_message(text="Please specify which certificate you need information about.")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have information about {cert_type} certificates.")
             return []
@@ -88,6 +104,7 @@ class ActionProvideApplicationProcess(Action):
     def name(self) -> Text:
         return "action_provide_application_process"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -97,7 +114,7 @@ class ActionProvideApplicationProcess(Action):
             dispatcher.utter_message(text="For which certificate would you like the application process?")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have application process details for {cert_type}.")
             return []
@@ -155,6 +172,7 @@ class ActionProvideDocumentsList(Action):
     def name(self) -> Text:
         return "action_provide_documents_list"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -164,7 +182,7 @@ class ActionProvideDocumentsList(Action):
             dispatcher.utter_message(text="For which certificate would you like the required documents?")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have document requirements for {cert_type}.")
             return []
@@ -191,6 +209,7 @@ class ActionProvideCostInfo(Action):
     def name(self) -> Text:
         return "action_provide_cost_info"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -200,7 +219,7 @@ class ActionProvideCostInfo(Action):
             dispatcher.utter_message(text="For which certificate would you like fee information?")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have fee details for {cert_type}.")
             return []
@@ -249,10 +268,11 @@ class ActionProvidePassportTatkalInfo(Action):
     def name(self) -> Text:
         return "action_provide_passport_tatkal_info"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        cert_info = CERT_DATA.get('passport') or CERT_DATA.get('passports')
+        cert_info = get_certificate_info('passport', 'passports')
         if not cert_info or 'tatkal_passport_procedure' not in cert_info:
             dispatcher.utter_message(text="Sorry, I don't have Tatkal passport information available.")
             return []
@@ -281,11 +301,12 @@ class ActionProvideLicenseTypes(Action):
     def name(self) -> Text:
         return "action_provide_license_types"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
-        cert_info = CERT_DATA.get('driving license') or CERT_DATA.get('driving_license')
+        cert_info = get_certificate_info('driving license')
         if not cert_info or 'types_of_license' not in cert_info:
             dispatcher.utter_message(text="Sorry, I don't have driving license type information available.")
             return []
@@ -305,6 +326,7 @@ class ActionProvideDuplicateInfo(Action):
     def name(self) -> Text:
         return "action_provide_duplicate_info"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -314,7 +336,7 @@ class ActionProvideDuplicateInfo(Action):
             dispatcher.utter_message(text="For which certificate do you need duplicate information?")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have duplicate certificate details for {cert_type}.")
             return []
@@ -360,6 +382,7 @@ class ActionProvideIssuingAuthority(Action):
     def name(self) -> Text:
         return "action_provide_issuing_authority"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -369,7 +392,7 @@ class ActionProvideIssuingAuthority(Action):
             dispatcher.utter_message(text="Please specify which certificate's issuing authority you need.")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have issuing authority information for {cert_type}.")
             return []
@@ -393,6 +416,7 @@ class ActionCheckEligibility(Action):
     def name(self) -> Text:
         return "action_check_eligibility"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -402,7 +426,7 @@ class ActionCheckEligibility(Action):
             dispatcher.utter_message(text="For which certificate would you like to check eligibility?")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info or 'eligibility' not in cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have eligibility criteria for {cert_type}.")
             return []
@@ -450,11 +474,12 @@ class ActionProvidePassportTypes(Action):
     def name(self) -> Text:
         return "action_provide_passport_types"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
-        cert_info = CERT_DATA.get('passport') or CERT_DATA.get('passports')
+        cert_info = get_certificate_info('passport', 'passports')
         if not cert_info or 'types_of_passport' not in cert_info:
             dispatcher.utter_message(text="Sorry, I don't have passport type information available.")
             return []
@@ -474,6 +499,7 @@ class ActionProvideOnlineApplicationInfo(Action):
     def name(self) -> Text:
         return "action_provide_online_application_info"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -483,7 +509,7 @@ class ActionProvideOnlineApplicationInfo(Action):
             dispatcher.utter_message(text="For which certificate would you like online application information?")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         online_portal = None
 
         if 'online_portal' in cert_info:
@@ -519,6 +545,7 @@ class ActionProvideProcessingTime(Action):
     def name(self) -> Text:
         return "action_provide_processing_time"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -528,7 +555,7 @@ class ActionProvideProcessingTime(Action):
             dispatcher.utter_message(text="For which certificate would you like processing time information?")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have processing time details for {cert_type}.")
             return []
@@ -581,11 +608,12 @@ class ActionProvideRationCardTypes(Action):
     def name(self) -> Text:
         return "action_provide_ration_card_types"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
-        cert_info = CERT_DATA.get('ration card') or CERT_DATA.get('ration_card')
+        cert_info = get_certificate_info('ration card')
         if not cert_info or 'types_of_ration_cards' not in cert_info:
             dispatcher.utter_message(text="Sorry, ration card type information isn't available.")
             return []
@@ -608,6 +636,7 @@ class ActionProvideValidityInfo(Action):
     def name(self) -> Text:
         return "action_provide_validity_info"
 
+    @profile_action
     def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
@@ -617,7 +646,7 @@ class ActionProvideValidityInfo(Action):
             dispatcher.utter_message(text="For which certificate would you like validity information?")
             return []
 
-        cert_info = CERT_DATA.get(cert_type.lower()) or CERT_DATA.get(cert_type.lower().replace(' ', '_'))
+        cert_info = get_certificate_info(cert_type)
         if not cert_info:
             dispatcher.utter_message(text=f"Sorry, I don't have validity information for {cert_type}.")
             return []
@@ -3,6 +3,11 @@ from textblob import TextBlob
 from nltk.corpus import wordnet
 from difflib import get_close_matches
 
+try:
+    from .profiling import profile_function, stage
+except ImportError:  # imported as a standalone module
+    from profiling import profile_function, stage
+
 # You may need to run:
 # import nltk
 # nltk.download('wordnet')
@@ -27,12 +32,15 @@ def normalize_to_concept(word):
                 return concept
     return word
 
+@profile_function("preprocess_user_input")
 def preprocess_user_input(text: str) -> str:
     # Step 1: Correct grammar/spelling
-    corrected = str(TextBlob(text).correct())
+    with stage("spell_correct"):
+        corrected = str(TextBlob(text).correct())
 
     # Step 2: Normalize synonyms
-    tokens = re.findall(r"\w+|\S", corrected)
-    processed = [normalize_to_concept(token) for token in tokens]
+    with stage("normalize"):
+        tokens = re.findall(r"\w+|\S", corrected)
+        processed = [normalize_to_concept(token) for token in tokens]
     return " ".join(processed)
 
@@ -0,0 +1,309 @@
+"""Opt-in sampling profiler for the action server.
+
+Disabled unless QUERYGOV_PROFILE=1 is set. When enabled, 1 in every
+QUERYGOV_PROFILE_SAMPLE_EVERY requests is profiled from the start, and any
+other request is profiled from the moment it runs longer than
+QUERYGOV_PROFILE_SLOW_MS. Profiled requests write:
+
+- stacks.folded: collapsed stacks ("frame;frame;frame count"), readable by
+  flamegraph.pl, speedscope and inferno.
+- timings.jsonl: one JSON line per request with total and per-stage timings.
+
+Both files live in QUERYGOV_PROFILE_DIR and are rotated by size, so the
+profiler can be left on in production.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, ContextManager, Dict, Iterator, Optional, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+_last_warning: Dict[Text, float] = {}
+
+
+def _warn(kind: Text, message: Text) -> None:
+    # At most one warning per kind per minute, so a full disk cannot flood the logs
+    now = time.monotonic()
+    if now - _last_warning.get(kind, -60.0) >= 60.0:
+        _last_warning[kind] = now
+        logger.warning(message)
+
+
+def _env_int(name: Text, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+ENABLED = os.environ.get("QUERYGOV_PROFILE", "").lower() in ("1", "true", "yes")
+SAMPLE_EVERY = _env_int("QUERYGOV_PROFILE_SAMPLE_EVERY", 100)
+SLOW_MS = _env_int("QUERYGOV_PROFILE_SLOW_MS", 500)
+INTERVAL_MS = max(_env_int("QUERYGOV_PROFILE_INTERVAL_MS", 10), 1)
+OUTPUT_DIR = os.environ.get("QUERYGOV_PROFILE_DIR", "profiles")
+# RotatingFileHandler never rotates when either of these is 0
+MAX_BYTES = max(_env_int("QUERYGOV_PROFILE_MAX_BYTES", 10 * 1024 * 1024), 1)
+BACKUP_COUNT = max(_env_int("QUERYGOV_PROFILE_BACKUPS", 5), 1)
+
+# Upper bounds so a single pathological request cannot grow without limit
+MAX_STACK_DEPTH = 64
+MAX_DISTINCT_STACKS = 500
+
+
+class RequestProfile:
+    def __init__(self, action_name: Text, sampled: bool):
+        self.action_name = action_name
+        self.sampled = sampled
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter()
+        self.stages: Dict[Text, float] = {}
+        # Replaced (never mutated) so the sampler thread can read it safely
+        self.stage_path: Tuple[Text, ...] = ()
+        self.stacks: Counter = Counter()
+        self.collecting = sampled
+        # Frame of the profiler entry point; stack walks stop there so the
+        # server stack above the request is left out of every sample
+        self.entry_frame = None
+
+    def add_stack(self, stack: Text) -> None:
+        if stack in self.stacks or len(self.stacks) < MAX_DISTINCT_STACKS:
+            self.stacks[stack] += 1
+        else:
+            self.stacks["[truncated]"] += 1
+
+
+class _Sampler(threading.Thread):
+    """Background thread that snapshots the stacks of in-flight requests."""
+
+    def __init__(self):
+        super().__init__(name="querygov-profiler", daemon=True)
+        self.active: Dict[int, RequestProfile] = {}
+        self.lock = threading.Lock()
+
+    def register(self, profile: RequestProfile) -> None:
+        with self.lock:
+            self.active[profile.thread_id] = profile
+
+    def unregister(self, profile: RequestProfile) -> None:
+        # Sampling happens under the same lock, so once this returns the
+        # profile's stacks are no longer touched and can be written out
+        with self.lock:
+            if self.active.get(profile.thread_id) is profile:
+                del self.active[profile.thread_id]
+
+    def run(self) -> None:
+        interval = INTERVAL_MS / 1000.0
+        while True:
+            time.sleep(interval)
+            self.sample()
+
+    def sample(self) -> None:
+        """Take one stack sample of every request that is being collected."""
+        with self.lock:
+            if not self.active:
+                return
+            now = time.perf_counter()
+            profiles = []
+            for profile in self.active.values():
+                if not profile.collecting and (now - profile.start) * 1000 >= SLOW_MS:
+                    profile.collecting = True
+                if profile.collecting:
+                    profiles.append(profile)
+            if not profiles:
+                return
+            try:
+                frames = sys._current_frames()
+                for profile in profiles:
+                    frame = frames.get(profile.thread_id)
+                    if frame is not None:
+                        profile.add_stack(_fold(profile, frame))
+                del frames
+            except Exception as e:
+                _warn("sample", f"Profiler sample failed: {str(e)}")
+
+
+def _fold(profile: RequestProfile, frame) -> Text:
+    names = []
+    while frame is not None and frame is not profile.entry_frame:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    names.reverse()
+    # Keep the root end so deep samples still merge with shallow ones
+    if len(names) > MAX_STACK_DEPTH:
+        names = names[:MAX_STACK_DEPTH] + ["[truncated]"]
+    return ";".join((profile.action_name,) + profile.stage_path + tuple(names))
+
+
+_local = threading.local()
+_sampler: Optional[_Sampler] = None
+_init_lock = threading.Lock()
+_stacks_log: Optional[logging.Logger] = None
+_timings_log: Optional[logging.Logger] = None
+
+
+class _RotatingHandler(RotatingFileHandler):
+    def handleError(self, record: logging.LogRecord) -> None:
+        # Disk full, permission and rotation errors end up here rather than
+        # being raised, so surface them instead of printing to stderr
+        _warn("write", f"Profiler could not write to {self.baseFilename}: {str(sys.exc_info()[1])}")
+
+
+def _file_logger(name: Text, filename: Text) -> logging.Logger:
+    file_logger = logging.getLogger(f"{__name__}.{name}")
+    file_logger.propagate = False
+    file_logger.setLevel(logging.INFO)
+    for old in list(file_logger.handlers):
+        file_logger.removeHandler(old)
+        old.close()
+    handler = _RotatingHandler(
+        os.path.join(OUTPUT_DIR, filename),
+        maxBytes=MAX_BYTES,
+        backupCount=BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    file_logger.addHandler(handler)
+    return file_logger
+
+
+def _ensure_started() -> bool:
+    global _sampler, _stacks_log, _timings_log, ENABLED
+    if _sampler is not None:
+        return True
+    with _init_lock:
+        if _sampler is None:
+            try:
+                os.makedirs(OUTPUT_DIR, exist_ok=True)
+                _stacks_log = _file_logger("stacks", "stacks.folded")
+                _timings_log = _file_logger("timings", "timings.jsonl")
+                sampler = _Sampler()
+                sampler.start()
+                _sampler = sampler
+            except Exception as e:
+                logger.error(f"Disabling profiler, could not start: {str(e)}")
+                ENABLED = False
+                return False
+    return True
+
+
+def _should_sample() -> bool:
+    return SAMPLE_EVERY > 0 and random.random() * SAMPLE_EVERY < 1
+
+
+def _write(profile: RequestProfile, elapsed: float) -> None:
+    record = {
+        "ts": time.time(),
+        "action": profile.action_name,
+        "reason": "sampled" if profile.sampled else "slow",
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "stages_ms": {name: round(t * 1000, 3) for name, t in profile.stages.items()},
+        "samples": sum(profile.stacks.values()),
+    }
+    _timings_log.info(json.dumps(record))
+    for stack, count in profile.stacks.items():
+        _stacks_log.info(f"{stack} {count}")
+
+
+_NO_STAGE = nullcontext()
+
+
+def stage(name: Text) -> ContextManager[None]:
+    """Time a block as a named stage of the current request.
+
+    Does nothing outside a profiled request, so it is safe to use in code
+    that also runs at import time or from scripts.
+    """
+    if not ENABLED:
+        return _NO_STAGE
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        return _NO_STAGE
+    return _timed_stage(profile, name)
+
+
+@contextmanager
+def _timed_stage(profile: RequestProfile, name: Text) -> Iterator[None]:
+    parent = profile.stage_path
+    profile.stage_path = parent + (name,)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        key = "/".join(profile.stage_path)
+        profile.stages[key] = profile.stages.get(key, 0.0) + time.perf_counter() - start
+        profile.stage_path = parent
+
+
+def _profiled_call(name: Text, func: Callable[..., Any], args, kwargs) -> Any:
+    if getattr(_local, "profile", None) is not None or not _ensure_started():
+        return func(*args, **kwargs)
+
+    profile = RequestProfile(name, _should_sample())
+    profile.entry_frame = sys._getframe()
+    _local.profile = profile
+    _sampler.register(profile)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - profile.start
+        _sampler.unregister(profile)
+        _local.profile = None
+        profile.entry_frame = None
+        if profile.sampled or elapsed * 1000 >= SLOW_MS:
+            try:
+                _write(profile, elapsed)
+            except Exception as e:
+                _warn("write", f"Profiler write failed: {str(e)}")
+
+
+def _check_sync(func: Callable[..., Any]) -> None:
+    # Request state is kept per thread, which interleaved coroutines would share
+    if inspect.iscoroutinefunction(func):
+        raise TypeError(f"Cannot profile coroutine function {func.__qualname__}, only synchronous ones")
+
+
+def profile_action(run: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorator for Action.run that profiles the request when enabled."""
+    _check_sync(run)
+
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        if not ENABLED:
+            return run(self, *args, **kwargs)
+        return _profiled_call(self.name(), run, (self,) + args, kwargs)
+
+    return wrapper
+
+
+def profile_function(name: Text) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator that profiles a plain function as its own request.
+
+    When called from inside a profiled action, its stages are recorded
+    under that action instead.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        _check_sync(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            return _profiled_call(name, func, args, kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,175 @@
+import importlib
+import json
+import time
+
+import pytest
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv("QUERYGOV_PROFILE", "1")
+    monkeypatch.setenv("QUERYGOV_PROFILE_SAMPLE_EVERY", "1")
+    monkeypatch.setenv("QUERYGOV_PROFILE_SLOW_MS", "10000")
+    monkeypatch.setenv("QUERYGOV_PROFILE_INTERVAL_MS", "1")
+    monkeypatch.setenv("QUERYGOV_PROFILE_DIR", str(tmp_path))
+    import actions.profiling
+    return importlib.reload(actions.profiling)
+
+
+def read_output(tmp_path):
+    timings = [json.loads(line) for line in (tmp_path / "timings.jsonl").read_text().splitlines()]
+    stacks = {}
+    for line in (tmp_path / "stacks.folded").read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        stacks[stack] = stacks.get(stack, 0) + int(count)
+    return timings, stacks
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampled_action_writes_timings_and_stacks(profiling, tmp_path):
+    class DummyAction:
+        def name(self):
+            return "action_dummy"
+
+        @profiling.profile_action
+        def run(self, value):
+            with profiling.stage("lookup"):
+                spin(0.02)
+            spin(0.02)
+            return value
+
+    assert DummyAction().run(42) == 42
+
+    timings, stacks = read_output(tmp_path)
+    assert len(timings) == 1
+    assert timings[0]["action"] == "action_dummy"
+    assert timings[0]["reason"] == "sampled"
+    assert list(timings[0]["stages_ms"]) == ["lookup"]
+    assert timings[0]["stages_ms"]["lookup"] >= 20
+    assert timings[0]["samples"] == sum(stacks.values()) > 0
+    assert all(stack.startswith("action_dummy;") for stack in stacks)
+    assert any(stack.startswith("action_dummy;lookup;") for stack in stacks)
+
+
+def test_samples_stop_when_request_finishes(profiling, tmp_path):
+    @profiling.profile_function("short_request")
+    def short_request():
+        spin(0.003)
+
+    for _ in range(50):
+        short_request()
+        # Work done between requests must not be charged to the last one
+        spin(0.003)
+
+    timings, stacks = read_output(tmp_path)
+    assert len(timings) == 50
+    assert sum(t["samples"] for t in timings) == sum(stacks.values())
+    # Stacks stop at the request entry point, so a sample taken after the
+    # request ended would show the test function above it
+    assert all(stack.split(";")[0] == "short_request" for stack in stacks)
+    assert not any("test_samples_stop_when_request_finishes" in stack for stack in stacks)
+
+
+def test_deep_stack_keeps_root_frames(profiling, tmp_path):
+    def rec(depth):
+        if depth:
+            return rec(depth - 1)
+        profiling._sampler.sample()
+
+    @profiling.profile_function("deep")
+    def deep():
+        with profiling.stage("lookup"):
+            rec(profiling.MAX_STACK_DEPTH + 16)
+
+    deep()
+
+    _, stacks = read_output(tmp_path)
+    truncated = [stack for stack in stacks if stack.endswith(";[truncated]")]
+    assert truncated
+    for stack in truncated:
+        frames = stack.split(";")
+        assert frames[:4] == ["deep", "lookup", "deep (test_profiling.py)", "rec (test_profiling.py)"]
+        assert len(frames) == 2 + profiling.MAX_STACK_DEPTH + 1
+
+
+def test_sampler_skips_frames_until_request_is_collected(profiling, monkeypatch):
+    sampler = profiling._Sampler()
+    profile = profiling.RequestProfile("action_dummy", sampled=False)
+    sampler.register(profile)
+
+    def fail():
+        raise AssertionError("frames captured for a request that is not collected")
+
+    with monkeypatch.context() as m:
+        m.setattr(profiling.sys, "_current_frames", fail)
+        sampler.sample()
+
+    profile.start -= profiling.SLOW_MS / 1000.0
+    sampler.sample()
+    assert profile.collecting
+    assert sum(profile.stacks.values()) == 1
+
+
+def test_sampler_ignores_unregistered_profile(profiling):
+    sampler = profiling._Sampler()
+    profile = profiling.RequestProfile("action_dummy", sampled=True)
+    sampler.register(profile)
+    sampler.sample()
+    sampler.unregister(profile)
+    sampler.sample()
+    assert sum(profile.stacks.values()) == 1
+
+
+def test_stage_outside_request_is_noop(profiling, tmp_path):
+    with profiling.stage("lookup"):
+        pass
+    assert not (tmp_path / "timings.jsonl").exists()
+
+
+def test_preprocess_user_input_is_profiled(profiling, tmp_path):
+    pytest.importorskip("textblob")
+    pytest.importorskip("nltk")
+    from actions import preprocessor
+    preprocessor = importlib.reload(preprocessor)
+
+    preprocessor.preprocess_user_input("what is the fee for pasport")
+
+    timings, _ = read_output(tmp_path)
+    assert timings[0]["action"] == "preprocess_user_input"
+    assert set(timings[0]["stages_ms"]) == {"spell_correct", "normalize"}
+
+
+def test_write_failure_is_logged_as_warning(profiling, caplog):
+    @profiling.profile_function("short_request")
+    def short_request():
+        pass
+
+    short_request()
+    profiling._timings_log.handlers[0].stream.close()
+    with caplog.at_level("WARNING", logger=profiling.__name__):
+        short_request()
+    assert "Profiler could not write" in caplog.text
+
+
+def test_coroutine_functions_are_rejected(profiling):
+    async def run():
+        pass
+
+    with pytest.raises(TypeError):
+        profiling.profile_action(run)
+    with pytest.raises(TypeError):
+        profiling.profile_function("run")(run)
+
+
+def test_rotation_limits_cannot_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("QUERYGOV_PROFILE_MAX_BYTES", "0")
+    monkeypatch.setenv("QUERYGOV_PROFILE_BACKUPS", "0")
+    import actions.profiling
+    profiling = importlib.reload(actions.profiling)
+    assert profiling.MAX_BYTES == 1
+    assert profiling.BACKUP_COUNT == 1